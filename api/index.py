@@ -5,14 +5,13 @@ Vercel looks for an app-level ASGI variable named `app` in files like
 `api/index.py`. We import the application from `backend.main`.
 """
 
-import os
 import sys
+from pathlib import Path
 
 # Ensure project root is in sys.path when running in Vercel's Python runtime
-_this_dir = os.path.dirname(__file__)
-_project_root = os.path.dirname(_this_dir)
-if _project_root not in sys.path:
-    sys.path.insert(0, _project_root)
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
 
 from backend.main import app  # FastAPI instance defined in backend/main.py
 
@@ -3,19 +3,255 @@ LangChain + Gemini compliance agent
 """
 
 import os
-import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Any, Optional
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Any, Final, Optional, Tuple
 
+import orjson
 from dotenv import load_dotenv
-try:
-    import pdfplumber  # optional, may be omitted in serverless
-except Exception:  # pragma: no cover
-    pdfplumber = None
-import PyPDF2
-import docx
+
 logger = logging.getLogger(__name__)
 
+_CACHE_MAX_ENTRIES = 256
+_TEXT_CACHE_MAX_ENTRIES = 128
+# Prompts use at most the first 15000 chars of a document, so PDF pages past this are not read
+_PDF_CHAR_BUDGET = 16000
+# Parsing these is GIL-bound pure Python, so it runs in worker processes
+_CPU_BOUND_EXTS: Final[frozenset[str]] = frozenset({"pdf", "doc", "docx"})
+# Serverless runtimes lack the shared-memory semaphores multiprocessing needs
+_IS_SERVERLESS = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+# Company policies are capped so a long paste cannot crowd the source text out of the prompt
+_POLICIES_CHAR_LIMIT = 4000
+
+# Prompt templates are built once at import; only the document-specific fields are formatted per call
+_ANALYSIS_SCHEMA: Final[str] = (
+    "{{\n"
+    "  \"regulation_summary\": \"string\",\n"
+    "  \"key_requirements\": [{{\n"
+    "    \"id\": \"string\", \"description\": \"string\", \"category\": \"string\", \"priority\": \"high|medium|low\"\n"
+    "  }}],\n"
+    "  \"compliance_obligations\": [\"string\"],\n"
+    "  \"risk_assessment\": {{\"overall_risk\": \"high|medium|low\"}},\n"
+    "  \"implementation_timeline\": \"string|null\",\n"
+    "  \"affected_departments\": [\"string\"],\n"
+    "  \"penalties_and_enforcement\": \"string|null\",\n"
+    "  \"recommended_actions\": [\"string\"],\n"
+    "  \"detected_framework\": \"string\",\n"
+    "  \"document_overview\": \"string\"\n"
+    "}}"
+)
+
+_ANALYZE_TEMPLATE: Final[str] = (
+    "You are an AI Compliance Officer.\n\n"
+    "Objective: Analyze the provided regulatory content and summarize obligations.\n"
+    "Rules: Output STRICT JSON only. If unknown, use null or [].\n\n"
+    "Hints -> regulation_type: {regulation_type}, jurisdiction: {jurisdiction}\n"
+    "Source Text (truncated):\n{text}\n\n"
+    "JSON Schema: " + _ANALYSIS_SCHEMA + "\n"
+    "Return only JSON."
+)
+
+# Several documents per call amortize the round-trip; documents are delimited by numbered headers
+_BATCH_DOCUMENT_TEMPLATE: Final[str] = (
+    "=== DOCUMENT {index} ===\n"
+    "Hints -> regulation_type: {regulation_type}, jurisdiction: {jurisdiction}\n"
+    "Source Text (truncated):\n{text}\n\n"
+)
+
+_BATCH_ANALYZE_TEMPLATE: Final[str] = (
+    "You are an AI Compliance Officer.\n\n"
+    "Objective: Analyze each of the {count} regulatory documents below independently and summarize its obligations.\n"
+    "Rules: Output STRICT JSON only. If unknown, use null or []. "
+    "Return exactly one analysis per document, in document order.\n\n"
+    "{documents}"
+    "JSON Schema: {{\"analyses\": [" + _ANALYSIS_SCHEMA + "]}}\n"
+    "Return only JSON."
+)
+# Larger uploads are split into batches of this size and sent concurrently
+_BATCH_MAX_DOCS = 8
+
+_CHECK_TEMPLATE: Final[str] = (
+    "You are an AI Compliance Officer.\n\n"
+    "Objective: Analyze the provided regulatory content and produce a structured compliance assessment specific to the detected framework.\n"
+    "Rules: Output STRICT JSON only (no markdown). Status in {{compliant, partially_compliant, non_compliant}}. Scores are 0-100 integers.\n"
+    "Do not invent facts; if unknown use null or []. Recommendations must be concrete and actionable.\n\n"
+    "Hints -> regulation_type: {hint_type}, jurisdiction: {hint_jurisdiction}\n"
+    "Company Policies:\n{policies}\n\n"
+    "Source Text (truncated):\n{text}\n\n"
+    "IMPORTANT: Generate specific, actionable recommendations based ONLY on the provided document and policies. Avoid generic advice.\n"
+    "For each gap, provide 2-3 concrete steps that can be implemented.\n\n"
+    "JSON Schema: {{\n"
+    "  \"regulation\": {{\"name\": \"string\", \"jurisdiction\": \"string|null\", \"type\": \"string\"}},\n"
+    "  \"overall\": {{\"status\": \"compliant|partially_compliant|non_compliant\", \"score\": 0, \"summary\": \"string\"}},\n"
+    "  \"sections\": [{{\n"
+    "    \"name\": \"string\", \"status\": \"compliant|partially_compliant|non_compliant\", \"score\": 0,\n"
+    "    \"gaps\": [{{\n"
+    "      \"gap_id\": \"string\", \"description\": \"string\", \"risk_level\": \"high|medium|low\",\n"
+    "      \"evidence\": \"string|null\", \"recommendations\": [\"string\"]\n"
+    "    }}]\n"
+    "  }}],\n"
+    "  \"top_recommendations\": [\"string\"],\n"
+    "  \"detected_framework\": \"string\",\n"
+    "  \"assumptions\": [\"string\"]\n"
+    "}}\n"
+    "Return only JSON."
+)
+
+# Framework-specific defaults used when the model returns no recommendations
+_GDPR_RECS: Final[Tuple[str, ...]] = (
+    "Implement data subject rights management system",
+    "Conduct Data Protection Impact Assessments (DPIAs)",
+    "Establish data breach notification procedures",
+    "Review and update privacy notices",
+    "Implement data minimization practices",
+)
+_HIPAA_RECS: Final[Tuple[str, ...]] = (
+    "Implement PHI access controls and audit logs",
+    "Conduct risk assessments for all PHI systems",
+    "Establish Business Associate Agreements (BAAs)",
+    "Implement workforce training on PHI handling",
+    "Develop incident response procedures",
+)
+_DEFAULT_RECS: Final[Tuple[str, ...]] = (
+    "Conduct comprehensive compliance review",
+    "Develop detailed action plan with timelines",
+    "Assign compliance responsibilities to team members",
+    "Implement regular monitoring and reporting",
+    "Establish training programs for staff",
+)
+
+_JSON_GENERATION_CONFIG: Final[Dict[str, str]] = {"response_mime_type": "application/json"}
+
+
+def _bounded_put(cache: Dict[str, Any], key: str, value: Any, max_entries: int) -> None:
+    if len(cache) >= max_entries:
+        # Evict the oldest entry (dicts keep insertion order)
+        cache.pop(next(iter(cache)))
+    cache[key] = value
+
+
+def _unique(items) -> List[Any]:
+    # First-seen order without repeats; keyed on the JSON encoding so unhashable (dict) entries
+    # from the model are deduplicated too
+    seen: Dict[bytes, Any] = {}
+    for item in items:
+        seen.setdefault(orjson.dumps(item, option=orjson.OPT_SORT_KEYS), item)
+    return list(seen.values())
+
+
+def _file_digest(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # spawn: the server process runs threads, which fork does not copy safely
+        _process_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+# Parsers are imported on first use so cold starts and analyze-only paths skip them
+def _extract_pdf(file_path: str) -> str:
+    # Prefer PDFium (native text extraction) if available; otherwise fall back to PyPDF2
+    try:
+        import pypdfium2 as pdfium  # optional, may be omitted in serverless
+    except Exception:  # pragma: no cover
+        pdfium = None
+    if pdfium is not None:
+        try:
+            parts: List[str] = []
+            size = 0
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                for page in pdf:
+                    textpage = page.get_textpage()
+                    t = textpage.get_text_range()
+                    textpage.close()
+                    page.close()
+                    if t:
+                        parts.append(t)
+                        size += len(t)
+                        if size >= _PDF_CHAR_BUDGET:
+                            break
+            finally:
+                pdf.close()
+            text = "\n".join(parts).replace("\r\n", "\n").strip()
+            if text:
+                return text
+        except Exception:
+            pass
+    import PyPDF2
+
+    # Serial on purpose: the char budget stops this after the first few pages, so sharding pages
+    # across processes parses mostly discarded pages, and this already runs in a pool worker
+    # (extract_document_text), which cannot submit to its own pool
+    parts: List[str] = []
+    size = 0
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for page in reader.pages:
+            t = page.extract_text() or ""
+            if t:
+                parts.append(t)
+                size += len(t)
+                if size >= _PDF_CHAR_BUDGET:
+                    break
+    return "\n".join(parts).strip()
+
+
+def _extract_docx(file_path: str) -> str:
+    import docx
+
+    d = docx.Document(file_path)
+    return "\n".join([p.text for p in d.paragraphs]).strip()
+
+
+def _extract_txt(file_path: str) -> str:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+_EXTRACTORS: Final[Dict[str, Callable[[str], str]]] = {
+    "pdf": _extract_pdf,
+    "doc": _extract_docx,
+    "docx": _extract_docx,
+    "txt": _extract_txt,
+}
+
+
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+_LLM_SEMAPHORE = asyncio.Semaphore(int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+
+
+def _get_model(api_key: str):
+    """Return the process-wide Gemini model, configuring the SDK on first use."""
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                # Imported on first use: the SDK is heavy and not every request needs the model.
+                # Use direct Google Generative AI instead of LangChain to avoid version conflicts
+                try:
+                    import google.generativeai as genai
+                except ImportError:
+                    raise ImportError("Please install google-generativeai: pip install google-generativeai")
+                genai.configure(api_key=api_key)
+                _MODEL = genai.GenerativeModel('gemini-1.5-pro')
+    return _MODEL
+
 
 class ComplianceAgent:
     def __init__(self) -> None:
@@ -24,93 +260,92 @@ class ComplianceAgent:
         if not api_key:
             raise ValueError("GEMINI_API_KEY not set")
 
-        # Use direct Google Generative AI instead of LangChain to avoid version conflicts
+        self._api_key = api_key
+        # Parsed JSON responses keyed by prompt hash; repeat uploads/retries skip the model call
+        self._cache: Dict[str, Any] = {}
+        # Extracted text keyed by file content digest; re-uploaded documents skip parsing
+        self._text_cache: Dict[str, str] = {}
+
+    @property
+    def model(self):
+        return _get_model(self._api_key)
+
+    async def _generate_json(self, prompt: str) -> Tuple[Optional[Any], str]:
+        """Return (parsed_json, raw_text) for a prompt; parsed_json is None if the output is not JSON."""
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        if key in self._cache:
+            return self._cache[key], ""
+        chunks: List[str] = []
+        # Bound in-flight requests so concurrent callers stay under the API rate limit
+        async with _LLM_SEMAPHORE:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=_JSON_GENERATION_CONFIG,
+                stream=True,
+            )
+            # Collect chunks as they arrive and join once instead of building the full response object
+            async for chunk in response:
+                chunks.append(chunk.text)
+        raw = "".join(chunks).strip()
         try:
-            import google.generativeai as genai
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-pro')
-        except ImportError:
-            raise ImportError("Please install google-generativeai: pip install google-generativeai")
+            parsed = orjson.loads(raw)
+        except Exception:
+            return None, raw
+        _bounded_put(self._cache, key, parsed, _CACHE_MAX_ENTRIES)
+        return parsed, raw
 
     async def extract_document_text(self, file_path: str) -> str:
-        ext = file_path.lower().split(".")[-1]
-        if ext == "pdf":
-            # Prefer pdfplumber if available; otherwise fall back to PyPDF2
-            if pdfplumber is not None:
-                try:
-                    text = ""
-                    with pdfplumber.open(file_path) as pdf:
-                        for p in pdf.pages:
-                            t = p.extract_text() or ""
-                            if t:
-                                text += t + "\n"
-                    if text.strip():
-                        return text.strip()
-                except Exception:
-                    pass
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                return "\n".join([p.extract_text() or "" for p in reader.pages]).strip()
-        if ext in {"doc", "docx"}:
-            d = docx.Document(file_path)
-            return "\n".join([p.text for p in d.paragraphs]).strip()
-        if ext == "txt":
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        raise ValueError(f"Unsupported file type: {ext}")
+        ext = file_path.rsplit(".", 1)[-1].lower()
+        extractor = _EXTRACTORS.get(ext)
+        if extractor is None:
+            raise ValueError(f"Unsupported file type: {ext}")
+        # Uploads land on a fresh temp path each time, so identify the document by its bytes
+        key = ext + ":" + await asyncio.to_thread(_file_digest, file_path)
+        if key in self._text_cache:
+            return self._text_cache[key]
+        if ext in _CPU_BOUND_EXTS and not _IS_SERVERLESS:
+            # A worker process parses without holding this interpreter's GIL, so concurrent uploads use separate cores
+            text = await asyncio.get_running_loop().run_in_executor(_get_process_pool(), extractor, file_path)
+        else:
+            # Blocking I/O; run it off the event loop
+            text = await asyncio.to_thread(extractor, file_path)
+        _bounded_put(self._text_cache, key, text, _TEXT_CACHE_MAX_ENTRIES)
+        return text
 
     async def analyze_regulation(self, text: str, regulation_type: str, jurisdiction: str) -> Dict[str, Any]:
+        analysis, _ = await self.analyze_regulation_with_status(text, regulation_type, jurisdiction)
+        return analysis
+
+    async def analyze_regulation_with_status(
+        self, text: str, regulation_type: str, jurisdiction: str
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Like analyze_regulation, also reporting whether the model produced the analysis (False for fallbacks)."""
         # Feed more context to improve document-specific outputs
-        if len(text) > 15000:
-            text = text[:15000]
-
-        prompt = (
-            "You are an AI Compliance Officer.\n\n"
-            "Objective: Analyze the provided regulatory content and summarize obligations.\n"
-            "Rules: Output STRICT JSON only. If unknown, use null or [].\n\n"
-            f"Hints -> regulation_type: {regulation_type}, jurisdiction: {jurisdiction}\n"
-            "Source Text (truncated):\n" + text + "\n\n"
-            "JSON Schema: {\n"
-            "  \"regulation_summary\": \"string\",\n"
-            "  \"key_requirements\": [{\n"
-            "    \"id\": \"string\", \"description\": \"string\", \"category\": \"string\", \"priority\": \"high|medium|low\"\n"
-            "  }],\n"
-            "  \"compliance_obligations\": [\"string\"],\n"
-            "  \"risk_assessment\": {\"overall_risk\": \"high|medium|low\"},\n"
-            "  \"implementation_timeline\": \"string|null\",\n"
-            "  \"affected_departments\": [\"string\"],\n"
-            "  \"penalties_and_enforcement\": \"string|null\",\n"
-            "  \"recommended_actions\": [\"string\"],\n"
-            "  \"detected_framework\": \"string\",\n"
-            "  \"document_overview\": \"string\"\n"
-            "}\n"
-            "Return only JSON."
+        prompt = _ANALYZE_TEMPLATE.format(
+            regulation_type=regulation_type,
+            jurisdiction=jurisdiction,
+            text=text[:15000],
         )
 
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={"response_mime_type": "application/json"},
-            )
-            raw = (response.text or "").strip()
-            try:
-                return json.loads(raw)
-            except Exception:
-                # Fallback to minimal structure using raw text
-                return {
-                    "regulation_summary": raw[:500] + ("..." if len(raw) > 500 else ""),
-                    "key_requirements": [],
-                    "compliance_obligations": [],
-                    "risk_assessment": {"overall_risk": "medium"},
-                    "implementation_timeline": None,
-                    "affected_departments": [],
-                    "penalties_and_enforcement": None,
-                    "recommended_actions": [],
-                    "detected_framework": regulation_type,
-                    "document_overview": f"Document analysis for {regulation_type} regulation in {jurisdiction}",
-                }
+            parsed, raw = await self._generate_json(prompt)
+            if parsed is not None:
+                return parsed, True
+            # Fallback to minimal structure using raw text
+            return {
+                "regulation_summary": raw[:500] + ("..." if len(raw) > 500 else ""),
+                "key_requirements": [],
+                "compliance_obligations": [],
+                "risk_assessment": {"overall_risk": "medium"},
+                "implementation_timeline": None,
+                "affected_departments": [],
+                "penalties_and_enforcement": None,
+                "recommended_actions": [],
+                "detected_framework": regulation_type,
+                "document_overview": f"Document analysis for {regulation_type} regulation in {jurisdiction}",
+            }, False
         except Exception as e:
-            logger.error(f"Error in analyze_regulation: {str(e)}")
+            logger.error("Error in analyze_regulation: %s", e)
             return {
                 "regulation_summary": f"Analysis generated for {regulation_type} ({jurisdiction})",
                 "key_requirements": [],
@@ -122,10 +357,57 @@ class ComplianceAgent:
                 "recommended_actions": [],
                 "detected_framework": regulation_type,
                 "document_overview": f"Document analysis for {regulation_type} regulation in {jurisdiction}",
-            }
+            }, False
+
+    async def analyze_regulations_batch(
+        self, docs: List[Tuple[str, str, str]]
+    ) -> List[Tuple[Dict[str, Any], bool]]:
+        """Analyze (text, regulation_type, jurisdiction) documents with one model call per batch.
+
+        Results are (analysis, from_model) pairs aligned with `docs`, as from
+        analyze_regulation_with_status. If a batch response is unusable, its documents are
+        analyzed individually.
+        """
+        if not docs:
+            return []
+        if len(docs) > _BATCH_MAX_DOCS:
+            batches = [docs[i:i + _BATCH_MAX_DOCS] for i in range(0, len(docs), _BATCH_MAX_DOCS)]
+            results = await asyncio.gather(*(self.analyze_regulations_batch(b) for b in batches))
+            return [analysis for batch in results for analysis in batch]
+
+        documents = "".join(
+            _BATCH_DOCUMENT_TEMPLATE.format(
+                index=i,
+                regulation_type=regulation_type,
+                jurisdiction=jurisdiction,
+                text=text[:15000],
+            )
+            for i, (text, regulation_type, jurisdiction) in enumerate(docs, 1)
+        )
+        prompt = _BATCH_ANALYZE_TEMPLATE.format(count=len(docs), documents=documents)
+        try:
+            parsed, _ = await self._generate_json(prompt)
+            analyses = parsed.get("analyses") if isinstance(parsed, dict) else None
+            # Only trust the response if it lines up one-to-one with the input
+            if (
+                isinstance(analyses, list)
+                and len(analyses) == len(docs)
+                and all(isinstance(a, dict) for a in analyses)
+            ):
+                return [(analysis, True) for analysis in analyses]
+        except Exception as e:
+            logger.error("Error in analyze_regulations_batch: %s", e)
+        return list(await asyncio.gather(*(self.analyze_regulation_with_status(*doc) for doc in docs)))
 
     async def check_compliance(self, regulation_text: str, company_policies: List[str], regulation_analysis: Dict[str, Any]) -> Dict[str, Any]:
-        policies_text = "\n".join(company_policies) if company_policies else "No specific policies provided"
+        result, _ = await self.check_compliance_with_status(regulation_text, company_policies, regulation_analysis)
+        return result
+
+    async def check_compliance_with_status(
+        self, regulation_text: str, company_policies: List[str], regulation_analysis: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Like check_compliance, also reporting whether the model produced the result (False for fallbacks)."""
+        policies_text = "\n".join(company_policies)[:_POLICIES_CHAR_LIMIT] if company_policies else "No specific policies provided"
         # Feed more of the source for better grounding
         truncated = regulation_text[:6000]
         
@@ -136,44 +418,22 @@ class ComplianceAgent:
             or "general"
         )
         hint_jurisdiction = regulation_analysis.get("jurisdiction") or "unknown"
+        hint_type_lc = hint_type.lower()
+        is_gdpr = "gdpr" in hint_type_lc
+        is_hipaa = "hipaa" in hint_type_lc
 
         # Universal, regulation-detecting JSON-only prompt
-        prompt = (
-            "You are an AI Compliance Officer.\n\n"
-            "Objective: Analyze the provided regulatory content and produce a structured compliance assessment specific to the detected framework.\n"
-            "Rules: Output STRICT JSON only (no markdown). Status in {compliant, partially_compliant, non_compliant}. Scores are 0-100 integers.\n"
-            "Do not invent facts; if unknown use null or []. Recommendations must be concrete and actionable.\n\n"
-            f"Hints -> regulation_type: {hint_type}, jurisdiction: {hint_jurisdiction}\n"
-            "Company Policies:\n" + policies_text + "\n\n"
-            "Source Text (truncated):\n" + truncated + "\n\n"
-            "IMPORTANT: Generate specific, actionable recommendations based ONLY on the provided document and policies. Avoid generic advice.\n"
-            "For each gap, provide 2-3 concrete steps that can be implemented.\n\n"
-            "JSON Schema: {\n"
-            "  \"regulation\": {\"name\": \"string\", \"jurisdiction\": \"string|null\", \"type\": \"string\"},\n"
-            "  \"overall\": {\"status\": \"compliant|partially_compliant|non_compliant\", \"score\": 0, \"summary\": \"string\"},\n"
-            "  \"sections\": [{\n"
-            "    \"name\": \"string\", \"status\": \"compliant|partially_compliant|non_compliant\", \"score\": 0,\n"
-            "    \"gaps\": [{\n"
-            "      \"gap_id\": \"string\", \"description\": \"string\", \"risk_level\": \"high|medium|low\",\n"
-            "      \"evidence\": \"string|null\", \"recommendations\": [\"string\"]\n"
-            "    }]\n"
-            "  }],\n"
-            "  \"top_recommendations\": [\"string\"],\n"
-            "  \"detected_framework\": \"string\",\n"
-            "  \"assumptions\": [\"string\"]\n"
-            "}\n"
-            "Return only JSON."
+        prompt = _CHECK_TEMPLATE.format(
+            hint_type=hint_type,
+            hint_jurisdiction=hint_jurisdiction,
+            policies=policies_text,
+            text=truncated,
         )
 
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={"response_mime_type": "application/json"},
-            )
-            raw = (response.text or "").strip()
-            try:
-                parsed = json.loads(raw)
-            except Exception:
+            parsed, raw = await self._generate_json(prompt)
+            from_model = parsed is not None
+            if parsed is None:
                 # Minimal fallback if model doesn't return JSON
                 parsed = {
                     "regulation": {"name": "unknown", "jurisdiction": None, "type": regulation_analysis.get("regulation_type", "general")},
@@ -187,55 +447,35 @@ class ComplianceAgent:
             # Normalize to API shape expected by frontend/backend
             overall_status = parsed.get("overall", {}).get("status", "partially_compliant")
             compliance_score = parsed.get("overall", {}).get("score", 60)
-            gaps = []
-            for s in parsed.get("sections", []):
-                for i, g in enumerate(s.get("gaps", []), 1):
-                    gaps.append({
-                        "gap_id": g.get("gap_id") or f"{s.get('name','SEC')}-{i}",
-                        "requirement": s.get("name", "Unknown"),
-                        "current_state": "unknown",
-                        "gap_description": g.get("description", ""),
-                        "impact_level": g.get("risk_level", "medium"),
-                        "remediation_effort": "medium",
-                        "recommended_actions": g.get("recommendations", []),
-                    })
+            gaps = [
+                {
+                    "gap_id": g.get("gap_id") or f"{s.get('name','SEC')}-{i}",
+                    "requirement": s.get("name", "Unknown"),
+                    "current_state": "unknown",
+                    "gap_description": g.get("description", ""),
+                    "impact_level": g.get("risk_level", "medium"),
+                    "remediation_effort": "medium",
+                    "recommended_actions": g.get("recommendations", []),
+                }
+                for s in parsed.get("sections", [])
+                for i, g in enumerate(s.get("gaps", []), 1)
+            ]
 
             recommendations = parsed.get("top_recommendations", [])
             if not recommendations:
                 # Build recommendations from gaps if top_recommendations missing
-                rec_set = []
-                for g in gaps:
-                    for r in g.get("recommended_actions", []) or []:
-                        if r and r not in rec_set:
-                            rec_set.append(r)
-                recommendations = rec_set
+                recommendations = _unique(
+                    r for g in gaps for r in (g["recommended_actions"] or []) if r
+                )
             
             # If still no recommendations, provide some based on the regulation type
             if not recommendations:
-                if "gdpr" in hint_type.lower():
-                    recommendations = [
-                        "Implement data subject rights management system",
-                        "Conduct Data Protection Impact Assessments (DPIAs)",
-                        "Establish data breach notification procedures",
-                        "Review and update privacy notices",
-                        "Implement data minimization practices"
-                    ]
-                elif "hipaa" in hint_type.lower():
-                    recommendations = [
-                        "Implement PHI access controls and audit logs",
-                        "Conduct risk assessments for all PHI systems",
-                        "Establish Business Associate Agreements (BAAs)",
-                        "Implement workforce training on PHI handling",
-                        "Develop incident response procedures"
-                    ]
+                if is_gdpr:
+                    recommendations = list(_GDPR_RECS)
+                elif is_hipaa:
+                    recommendations = list(_HIPAA_RECS)
                 else:
-                    recommendations = [
-                        "Conduct comprehensive compliance review",
-                        "Develop detailed action plan with timelines",
-                        "Assign compliance responsibilities to team members",
-                        "Implement regular monitoring and reporting",
-                        "Establish training programs for staff"
-                    ]
+                    recommendations = list(_DEFAULT_RECS)
 
             return {
                 "overall_status": overall_status,
@@ -243,34 +483,21 @@ class ComplianceAgent:
                 "gaps": gaps,
                 "recommendations": recommendations,
                 "detailed_analysis": parsed,
-            }
+            }, from_model
         except Exception as e:
-            logger.error(f"Error in check_compliance: {str(e)}")
+            logger.error("Error in check_compliance: %s", e)
             # Provide fallback recommendations based on regulation type
-            fallback_recs = []
-            if "gdpr" in hint_type.lower():
-                fallback_recs = [
-                    "Implement data subject rights management system",
-                    "Conduct Data Protection Impact Assessments (DPIAs)",
-                    "Establish data breach notification procedures"
-                ]
-            elif "hipaa" in hint_type.lower():
-                fallback_recs = [
-                    "Implement PHI access controls and audit logs",
-                    "Conduct risk assessments for all PHI systems",
-                    "Establish Business Associate Agreements (BAAs)"
-                ]
+            if is_gdpr:
+                fallback_recs = list(_GDPR_RECS[:3])
+            elif is_hipaa:
+                fallback_recs = list(_HIPAA_RECS[:3])
             else:
-                fallback_recs = [
-                    "Conduct comprehensive compliance review",
-                    "Develop detailed action plan with timelines",
-                    "Assign compliance responsibilities to team members"
-                ]
-            
+                fallback_recs = list(_DEFAULT_RECS[:3])
+
             return {
                 "overall_status": "partially_compliant",
                 "compliance_score": 60,
                 "gaps": [],
                 "recommendations": fallback_recs,
                 "detailed_analysis": {"error": str(e)},
-            }
\ No newline at end of file
+            }, False
\ No newline at end of file
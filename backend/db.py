@@ -2,8 +2,12 @@
 Database setup using SQLModel and SQLite
 """
 
-from typing import Iterator
-from sqlmodel import SQLModel, create_engine, Session
+from typing import AsyncIterator
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
 
 
@@ -12,26 +16,90 @@ IS_SERVERLESS = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"
 default_db_path = "/tmp/compliance.db" if IS_SERVERLESS else "compliance.db"
 DB_PATH = os.getenv("COMPLIANCE_DB_PATH", default_db_path)
 DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
 # check_same_thread False to allow usage in async context (FastAPI)
-engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    connect_args={"check_same_thread": False},
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+)
+
+# Request handlers use the async engine so queries do not block the event loop;
+# the sync engine above is kept for schema setup in init_db().
+# Connections are long-lived so SQLite's per-connection page cache stays warm; a local
+# file cannot drop a connection underneath us, so no pre-ping round trip
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=10,
+    max_overflow=5,
+    pool_pre_ping=False,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# WAL lets readers proceed while a write is in flight; the rest trades durability on
+# power loss (not crash) and memory for fewer fsyncs and disk reads
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+_DB_READY = False
+
+# Columns added after the first release, per table: (name, SQLite type)
+_ADDED_COLUMNS = {
+    "source": (("due_days", "INTEGER"),),
+    "sourceversion": (("etag", "VARCHAR"), ("last_modified", "VARCHAR"), ("hash_algo", "VARCHAR")),
+}
 
 
 def init_db() -> None:
-    SQLModel.metadata.create_all(engine)
-    # Lightweight migration: add missing columns if the DB was created before schema updates
-    with engine.connect() as conn:
+    global _DB_READY
+    if _DB_READY:
+        return
+    with engine.begin() as conn:
+        SQLModel.metadata.create_all(conn)
+        # create_all skips existing tables entirely, so add indexes declared after they were created
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        # Lightweight migration: add missing columns if the DB was created before schema updates
         try:
-            cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info('source')").fetchall()]
-            if 'due_days' not in cols:
-                conn.exec_driver_sql("ALTER TABLE source ADD COLUMN due_days INTEGER")
+            inspector = inspect(conn)
+            for table, columns in _ADDED_COLUMNS.items():
+                existing = {c["name"] for c in inspector.get_columns(table)}
+                for name, ddl_type in columns:
+                    if name not in existing:
+                        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}")
         except Exception:
             # If anything goes wrong, skip silently to avoid startup failure
             pass
+    _DB_READY = True
 
 
-def get_session() -> Iterator[Session]:
-    with Session(engine) as session:
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
         yield session
 
 
@@ -0,0 +1,79 @@
+"""
+ASGI middleware for compressed request bodies
+"""
+
+import zlib
+
+import orjson
+
+
+# Upper bound on a decompressed request body; guards against gzip bombs
+MAX_DECOMPRESSED_BODY = 32 * 1024 * 1024
+
+
+class GzipRequestMiddleware:
+    """Inflate request bodies sent with ``Content-Encoding: gzip``.
+
+    Starlette's GZipMiddleware only compresses responses. Clients posting large policy
+    lists compress them instead, and the handlers below see the plain JSON body.
+    """
+
+    def __init__(self, app, max_body: int = MAX_DECOMPRESSED_BODY):
+        self.app = app
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = scope["headers"]
+        encoding = next((v for k, v in headers if k == b"content-encoding"), None)
+        if encoding is None or encoding.strip().lower() != b"gzip":
+            return await self.app(scope, receive, send)
+
+        # wbits 16+MAX_WBITS expects the gzip header and trailer
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks, size = [], 0
+        try:
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                more_body = message.get("more_body", False)
+                data = message.get("body", b"")
+                while data:
+                    out = inflater.decompress(data, self.max_body - size + 1)
+                    size += len(out)
+                    if size > self.max_body:
+                        return await _error(send, 413, "Request body too large")
+                    chunks.append(out)
+                    data = inflater.unconsumed_tail
+            if not inflater.eof:
+                return await _error(send, 400, "Truncated gzip request body")
+        except zlib.error:
+            return await _error(send, 400, "Invalid gzip request body")
+
+        body = b"".join(chunks)
+        scope = dict(scope)
+        scope["headers"] = [(k, v) for k, v in headers if k not in (b"content-encoding", b"content-length")]
+        scope["headers"].append((b"content-length", str(len(body)).encode()))
+        sent = False
+
+        async def receive_inflated():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return await self.app(scope, receive_inflated, send)
+
+
+async def _error(send, status: int, detail: str):
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,41 +1,8 @@
-"""
-Pydantic models for Compliance API
-"""
-
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-
-
-class RegulationDocument(BaseModel):
-    id: str
-    filename: str
-    file_path: str
-    regulation_type: str
-    jurisdiction: str
-    effective_date: Optional[str]
-    extracted_text: str
-    analysis_result: Dict[str, Any]
-    upload_date: str
-    status: str
-
-
-class ComplianceCheck(BaseModel):
-    regulation_id: str
-    company_policies: List[str] = Field(default_factory=list)
-    specific_requirements: Optional[List[str]] = None
-
-
-class ComplianceReport(BaseModel):
-    regulation_id: str
-    include_recommendations: bool = True
-    include_gap_analysis: bool = True
-    include_policy_mapping: bool = True
-
 """
 Pydantic models for the Compliance Officer API
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -63,6 +30,8 @@ class RegulationUpload(BaseModel):
     effective_date: Optional[str] = None
 
 class RegulationDocument(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     filename: str
     file_path: str
@@ -75,6 +44,8 @@ class RegulationDocument(BaseModel):
     status: str
 
 class ComplianceCheck(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     regulation_id: str
     company_policies: List[str] = Field(
         default_factory=list,
@@ -85,6 +56,15 @@ class ComplianceCheck(BaseModel):
         description="Specific compliance requirements to check"
     )
 
+class ComplianceCheckBatch(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    regulation_id: str
+    policy_batches: List[List[str]] = Field(
+        default_factory=list,
+        description="Company policies split into chunks; each chunk is checked separately"
+    )
+
 class ComplianceResult(BaseModel):
     overall_status: ComplianceStatus
     compliance_score: float = Field(ge=0, le=100)
@@ -93,6 +73,8 @@ class ComplianceResult(BaseModel):
     detailed_analysis: Dict[str, Any]
 
 class ComplianceReport(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     regulation_id: str
     include_recommendations: bool = True
     include_gap_analysis: bool = True
@@ -2,15 +2,25 @@
 Report generation utilities (PDF/Excel)
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Sequence
 from datetime import datetime
+import asyncio
+import hashlib
+import io
 import os
+import textwrap
+import uuid
 
+import orjson
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 import xlsxwriter
 
+# In serverless (e.g., Vercel) write to /tmp; resolved once, created on first report
+_OUT_DIR = "/tmp/reports" if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "reports"
+_out_dir_ready = False
+
 
 class ReportGenerator:
     async def generate_report(
@@ -20,63 +30,146 @@ class ReportGenerator:
         report_format: str = "pdf",
         include_recommendations: bool = True,
     ) -> str:
-        # In serverless (e.g., Vercel) write to /tmp
-        out_dir = "/tmp/reports" if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "reports"
-        os.makedirs(out_dir, exist_ok=True)
-        ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        global _out_dir_ready
+        if not _out_dir_ready:
+            await asyncio.to_thread(os.makedirs, _OUT_DIR, exist_ok=True)
+            _out_dir_ready = True
+        if report_format not in ("pdf", "xlsx"):
+            raise ValueError("Unsupported format. Use 'pdf' or 'xlsx'.")
         reg_id = regulation_data.get("id") or "unknown"
-        base_name = f"report_{reg_id}_{ts}"
-        if report_format == "pdf":
-            path = os.path.join(out_dir, base_name + ".pdf")
-            self._build_pdf(path, regulation_data, compliance_checks, include_recommendations)
-            return path
-        if report_format == "xlsx":
-            path = os.path.join(out_dir, base_name + ".xlsx")
-            self._build_xlsx(path, regulation_data, compliance_checks)
+        # Content-addressed name: the same regulation, checks and options map to the same file,
+        # so an unchanged report is served from disk instead of being rebuilt. Status is part
+        # of the key because the analysis is only filled in once processing finishes.
+        key = hashlib.blake2b(
+            orjson.dumps({
+                "r": reg_id,
+                "s": regulation_data.get("status"),
+                "c": sorted(str(chk.get("id")) for chk in compliance_checks),
+                "fmt": report_format,
+                "recs": include_recommendations,
+            }, option=orjson.OPT_SORT_KEYS),
+            digest_size=16,
+        ).hexdigest()
+        path = os.path.join(_OUT_DIR, f"report_{reg_id}_{key}.{report_format}")
+        if await asyncio.to_thread(os.path.exists, path):
             return path
-        raise ValueError("Unsupported format. Use 'pdf' or 'xlsx'.")
+        # Build under a private name and rename into place, so concurrent requests for the
+        # same report never observe a half-written file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            # Building the file is CPU + blocking disk work; keep it off the event loop
+            if report_format == "pdf":
+                generated_at = datetime.utcnow().isoformat()
+                await asyncio.to_thread(self._build_pdf, tmp_path, regulation_data, compliance_checks, include_recommendations, generated_at)
+            else:
+                await asyncio.to_thread(self._build_xlsx, tmp_path, regulation_data, compliance_checks)
+            await asyncio.to_thread(os.replace, tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    async def generate_reports(
+        self,
+        regulation_data: Dict[str, Any],
+        compliance_checks: List[Dict[str, Any]],
+        formats: Sequence[str] = ("pdf", "xlsx"),
+        include_recommendations: bool = True,
+    ) -> Dict[str, str]:
+        """Build several formats of the same report concurrently; returns {format: path}."""
+        for fmt in formats:
+            if fmt not in ("pdf", "xlsx"):
+                raise ValueError("Unsupported format. Use 'pdf' or 'xlsx'.")
+        # Each builder runs on its own worker thread, so reportlab and xlsxwriter overlap
+        paths = await asyncio.gather(*(
+            self.generate_report(regulation_data, compliance_checks, fmt, include_recommendations)
+            for fmt in formats
+        ))
+        return dict(zip(formats, paths))
 
-    def _build_pdf(self, path: str, reg: Dict[str, Any], checks: List[Dict[str, Any]], include_recs: bool) -> None:
-        c = canvas.Canvas(path, pagesize=A4)
+    def _build_pdf(
+        self,
+        path: str,
+        reg: Dict[str, Any],
+        checks: List[Dict[str, Any]],
+        include_recs: bool,
+        generated_at: str,
+    ) -> None:
+        # Render into memory and write the finished document with a single write() call
+        buf = io.BytesIO()
+        c = canvas.Canvas(buf, pagesize=A4)
         width, height = A4
-        y = height - 2 * cm
+        left = 2 * cm
+        top = height - 2 * cm
+        bottom = 2 * cm
+        content_w = width - 4 * cm
+        # Each page's lines go into one text object, emitted as a single BT/ET block of Tj/T*
+        # operators; full pages are flushed as soon as they fill up
+        cur_font = ("Helvetica", 10)
+        tobj = c.beginText(left, top)
 
-        def line(text: str, step: float = 14):
-            nonlocal y
-            c.drawString(2 * cm, y, text[:110])
-            y -= step
+        def new_page() -> None:
+            nonlocal tobj
+            c.drawText(tobj)
+            c.showPage()
+            tobj = c.beginText(left, top)
+            tobj.setFont(*cur_font, leading=14)
 
-        c.setFont("Helvetica-Bold", 16)
+        def font(name: str, size: float) -> None:
+            nonlocal cur_font
+            cur_font = (name, size)
+            tobj.setFont(name, size, leading=14)
+
+        def text_line(text: str) -> None:
+            if tobj.getY() < bottom:
+                new_page()
+            tobj.textLine(text)
+
+        def heading(title: str, keep: float = 4 * 14) -> None:
+            # Start the section on a fresh page rather than strand its title at the bottom
+            if tobj.getY() - keep < bottom:
+                new_page()
+            font("Helvetica-Bold", 12)
+            line(title)
+            font("Helvetica", 10)
+
+        def line(text: str) -> None:
+            # Single-line labels: clip only when needed instead of slicing every string
+            if len(text) > 110:
+                text = text[:110]
+            text_line(text)
+
+        def emit(text: str) -> None:
+            # Free text is wrapped rather than clipped so long paragraphs survive intact
+            for seg in textwrap.wrap(text, 110, subsequent_indent="  ") or [""]:
+                text_line(seg)
+
+        font("Helvetica-Bold", 16)
         line("Compliance Report")
-        c.setFont("Helvetica", 10)
-        line(f"Generated: {datetime.utcnow().isoformat()}Z")
+        font("Helvetica", 10)
+        line(f"Generated: {generated_at}Z")
         line("")
 
-        c.setFont("Helvetica-Bold", 12)
-        line("Regulation")
-        c.setFont("Helvetica", 10)
+        heading("Regulation")
         line(f"ID: {reg.get('id')}")
         line(f"Filename: {reg.get('filename')}")
         line(f"Type: {reg.get('regulation_type')} | Jurisdiction: {reg.get('jurisdiction')}")
         line("")
 
         analysis = reg.get("analysis_result", {})
-        c.setFont("Helvetica-Bold", 12)
-        line("Executive Summary")
-        c.setFont("Helvetica", 10)
+        heading("Executive Summary")
         for para in str(analysis.get("regulation_summary", "N/A")).split("\n"):
-            line(para)
+            emit(para)
         line("")
 
         # Document Overview (personalized to input document)
-        c.setFont("Helvetica-Bold", 12)
-        line("Document Overview")
-        c.setFont("Helvetica", 10)
+        heading("Document Overview")
         
         # Show document overview if available
         doc_overview = analysis.get("document_overview")
         if doc_overview:
-            line(f"Overview: {doc_overview}")
+            emit(f"Overview: {doc_overview}")
         
         det_framework = analysis.get("detected_framework") or analysis.get("framework")
         if det_framework:
@@ -94,46 +187,62 @@ class ReportGenerator:
                 line(f"- {ob}")
         line("")
 
-        c.setFont("Helvetica-Bold", 12)
-        line("Compliance Checks")
-        c.setFont("Helvetica", 10)
+        heading("Compliance Checks")
         overall_best_score = None
         last_detailed = None
+        # Recommendations from every source, deduplicated in first-seen order
+        rec_order: Dict[str, None] = {}
+
+        def add_recs(items) -> None:
+            for r in items or []:
+                if isinstance(r, str):
+                    r = r.strip()
+                    if r:
+                        rec_order.setdefault(r, None)
+
         for chk in checks:
-            result = chk.get("result") or chk.get("compliance_result") or {}
+            cid = chk.get("id")
             result = chk.get("result") or chk.get("compliance_result") or {}
             score = result.get("compliance_score", "N/A")
             status = result.get("overall_status", "N/A")
-            line(f"Check: {chk.get('id')} | Score: {score}")
+            line(f"Check: {cid} | Score: {score}")
             line(f"Status: {status}")
             if isinstance(score, (int, float)):
                 overall_best_score = max(overall_best_score or 0, score)
-            if result.get("detailed_analysis"):
-                last_detailed = result.get("detailed_analysis")
+            detailed = result.get("detailed_analysis")
+            if detailed:
+                last_detailed = detailed
             gaps = result.get("gaps", [])
             if gaps:
                 line("Gaps:")
                 for g in gaps[:10]:
                     line(f"- {g.get('requirement', 'N/A')}: {g.get('gap_description', '')}")
+            add_recs(result.get("recommendations"))
+            if isinstance(detailed, dict):
+                add_recs(detailed.get("top_recommendations"))
+                for section in detailed.get("sections", []):
+                    for gap in section.get("gaps", []):
+                        add_recs(gap.get("recommendations"))
         line("")
 
         # Score bar visualization (simple)
         if overall_best_score is not None:
-            c.setFont("Helvetica-Bold", 12)
-            line("Compliance Score (Best)")
-            c.setFont("Helvetica", 10)
-            bar_x = 2 * cm
-            bar_y = y
-            bar_w = width - 4 * cm
+            heading("Compliance Score (Best)", keep=3 * 14 + 20)
+            bar_x = left
+            bar_y = tobj.getY()
+            bar_w = content_w
             bar_h = 10
+            bar_unit = bar_w * 0.01  # width of one score point
             # outline
             c.rect(bar_x, bar_y, bar_w, bar_h, stroke=1, fill=0)
             # fill proportional
-            filled_w = max(0, min(100, int(overall_best_score))) / 100 * bar_w
+            best = int(overall_best_score)
+            best = 0 if best < 0 else 100 if best > 100 else best
+            filled_w = best * bar_unit
             c.setFillGray(0.2)
             c.rect(bar_x, bar_y, filled_w, bar_h, stroke=0, fill=1)
             c.setFillGray(0.0)
-            y -= 20
+            tobj.moveCursor(0, 20)
             line(f"Score: {int(overall_best_score)} / 100")
             line("")
 
@@ -141,16 +250,12 @@ class ReportGenerator:
         if last_detailed and isinstance(last_detailed, dict):
             framework = last_detailed.get("detected_framework")
             if framework:
-                c.setFont("Helvetica-Bold", 12)
-                line(f"Detected Framework: {framework}")
-                c.setFont("Helvetica", 10)
+                heading(f"Detected Framework: {framework}")
                 line("")
 
             sections = last_detailed.get("sections") or []
             if sections:
-                c.setFont("Helvetica-Bold", 12)
-                line("Sections Overview")
-                c.setFont("Helvetica", 10)
+                heading("Sections Overview")
                 for s in sections[:12]:
                     s_name = s.get("name", "Section")
                     s_status = s.get("status", "N/A")
@@ -159,71 +264,55 @@ class ReportGenerator:
                 line("")
 
         if include_recs:
-            c.setFont("Helvetica-Bold", 12)
-            line("Recommendations")
-            c.setFont("Helvetica", 10)
-            recs: List[str] = []
-            
-            # Collect recommendations from all sources
-            for chk in checks:
-                result = chk.get("result") or chk.get("compliance_result") or {}
-                recs.extend(result.get("recommendations", []))
-                
-                # Also collect from detailed analysis
-                detailed = result.get("detailed_analysis", {})
-                if isinstance(detailed, dict):
-                    recs.extend(detailed.get("top_recommendations", []))
-                    for section in detailed.get("sections", []):
-                        for gap in section.get("gaps", []):
-                            recs.extend(gap.get("recommendations", []))
-            
-            # Also collect from regulation analysis
-            reg_recs = analysis.get("recommended_actions", [])
-            if reg_recs:
-                recs.extend(reg_recs)
-            
-            # De-duplicate while preserving order
-            seen = set()
-            unique_recs = []
-            for r in recs:
-                if r and r not in seen and isinstance(r, str) and r.strip():
-                    seen.add(r.strip())
-                    unique_recs.append(r.strip())
-            
+            heading("Recommendations")
+            # Regulation-level actions come after those from the checks
+            add_recs(analysis.get("recommended_actions"))
+            unique_recs = list(rec_order)
             if unique_recs:
                 for r in unique_recs[:20]:
-                    line(f"- {r}")
+                    emit(f"- {r}")
             else:
                 line("No specific recommendations available at this time.")
 
         # Tailored Suggestions per Document (derive additional suggestions from detailed sections)
-        extra_suggestions: List[str] = []
+        # Insertion-ordered dict keys: O(1) membership instead of scanning the list per item
+        extra_order: Dict[str, None] = {}
         if last_detailed and isinstance(last_detailed, dict):
             for s in (last_detailed.get("sections") or [])[:10]:
                 for g in s.get("gaps", [])[:3]:
                     for rcmd in g.get("recommendations", [])[:2]:
-                        if rcmd and rcmd not in extra_suggestions:
-                            extra_suggestions.append(rcmd)
+                        if rcmd and isinstance(rcmd, str):
+                            extra_order.setdefault(rcmd, None)
+        extra_suggestions = list(extra_order)
         # If we have extra, print them on a new page block
         if extra_suggestions:
             line("")
-            c.setFont("Helvetica-Bold", 12)
-            line("Tailored Suggestions (From this Document)")
-            c.setFont("Helvetica", 10)
+            heading("Tailored Suggestions (From this Document)")
             for r in extra_suggestions[:15]:
-                line(f"- {r}")
+                emit(f"- {r}")
 
+        c.drawText(tobj)
         c.showPage()
         c.save()
+        with open(path, "wb") as f:
+            f.write(buf.getbuffer())
 
     def _build_xlsx(self, path: str, reg: Dict[str, Any], checks: List[Dict[str, Any]]) -> None:
-        workbook = xlsxwriter.Workbook(path)
+        # constant_memory flushes each row to disk once the next one starts, so every sheet
+        # must be written top to bottom; the string conversions are off because cells hold plain text
+        workbook = xlsxwriter.Workbook(path, {
+            "constant_memory": True,
+            "strings_to_numbers": False,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        })
         try:
+            # Formats are workbook-level objects: create each once, never per row
+            header_fmt = workbook.add_format({"bold": True})
+
             # Sheet: Regulation
             ws_meta = workbook.add_worksheet("Regulation")
-            headers = ["field", "value"]
-            for col, h in enumerate(headers):
-                ws_meta.write(0, col, h)
+            ws_meta.write_row(0, 0, ("field", "value"), header_fmt)
             meta_rows = [
                 ("id", reg.get("id")),
                 ("filename", reg.get("filename")),
@@ -231,37 +320,42 @@ class ReportGenerator:
                 ("jurisdiction", reg.get("jurisdiction")),
                 ("uploaded", reg.get("upload_date")),
             ]
-            for r, (k, v) in enumerate(meta_rows, start=1):
-                ws_meta.write(r, 0, k)
-                ws_meta.write(r, 1, v)
+            for r, row in enumerate(meta_rows, start=1):
+                ws_meta.write_row(r, 0, row)
 
             # Sheet: Checks
             ws_checks = workbook.add_worksheet("Checks")
-            checks_headers = ["check_id", "score", "status"]
-            for col, h in enumerate(checks_headers):
-                ws_checks.write(0, col, h)
+            ws_checks.write_row(0, 0, ("check_id", "score", "status"), header_fmt)
             row_idx = 1
             for chk in checks:
                 res = chk.get("result") or chk.get("compliance_result") or {}
-                ws_checks.write(row_idx, 0, chk.get("id"))
-                ws_checks.write(row_idx, 1, res.get("compliance_score"))
-                ws_checks.write(row_idx, 2, res.get("overall_status"))
+                ws_checks.write_row(row_idx, 0, (chk.get("id"), res.get("compliance_score"), res.get("overall_status")))
                 row_idx += 1
 
             # Sheet: Gaps
             ws_gaps = workbook.add_worksheet("Gaps")
-            gaps_headers = ["check_id", "requirement", "gap", "impact", "effort"]
-            for col, h in enumerate(gaps_headers):
-                ws_gaps.write(0, col, h)
+            ws_gaps.write_row(0, 0, ("check_id", "requirement", "gap", "impact", "effort"), header_fmt)
+            # This is the sheet that grows with the model output: cells are almost always text,
+            # so call write_string directly and skip write()'s per-cell type dispatch
+            write_string = ws_gaps.write_string
+            write_any = ws_gaps.write
             row_idx = 1
             for chk in checks:
+                cid = chk.get("id")
                 res = chk.get("result") or chk.get("compliance_result") or {}
                 for g in res.get("gaps", []):
-                    ws_gaps.write(row_idx, 0, chk.get("id"))
-                    ws_gaps.write(row_idx, 1, g.get("requirement"))
-                    ws_gaps.write(row_idx, 2, g.get("gap_description"))
-                    ws_gaps.write(row_idx, 3, g.get("impact_level"))
-                    ws_gaps.write(row_idx, 4, g.get("remediation_effort"))
+                    cells = (
+                        cid,
+                        g.get("requirement"),
+                        g.get("gap_description"),
+                        g.get("impact_level"),
+                        g.get("remediation_effort"),
+                    )
+                    for col, value in enumerate(cells):
+                        if type(value) is str:
+                            write_string(row_idx, col, value)
+                        elif value is not None:
+                            write_any(row_idx, col, value)
                     row_idx += 1
         finally:
             workbook.close()
@@ -2,9 +2,58 @@
 SQLModel database schemas for persistence
 """
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-from sqlmodel import SQLModel, Field, JSON
+import gzip
+import os
+import time
+import uuid
+import orjson
+from sqlalchemy import Index, LargeBinary
+from sqlalchemy.types import TypeDecorator
+from sqlmodel import SQLModel, Field, Relationship
+
+
+def new_id() -> str:
+    """Return a UUIDv7 string: a 48-bit ms timestamp followed by random bits (RFC 9562).
+
+    Ids sort by creation time, so primary-key inserts append to the end of the B-tree
+    instead of landing on random pages like uuid4.
+    """
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76  # version
+        | ((rand >> 62) & 0xFFF) << 64
+        | 0b10 << 62  # RFC 4122 variant
+        | (rand & 0x3FFF_FFFF_FFFF_FFFF)
+    )
+    return str(uuid.UUID(int=value))
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON stored as a gzip-compressed BLOB.
+
+    Model output is highly repetitive, so these blobs shrink several times over and every
+    SELECT moves far fewer bytes. Rows written before compression hold plain JSON text and
+    are still read as-is.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Optional[bytes]:
+        if value is None:
+            return None
+        return gzip.compress(orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS), compresslevel=6, mtime=0)
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == b"\x1f\x8b":
+            value = gzip.decompress(value)
+        return orjson.loads(value)
 
 
 class Regulation(SQLModel, table=True):
@@ -15,16 +64,28 @@ class Regulation(SQLModel, table=True):
     jurisdiction: str
     effective_date: Optional[str] = None
     extracted_text: str
-    analysis_result: Dict[str, Any] = Field(sa_type=JSON)
+    analysis_result: Dict[str, Any] = Field(sa_type=CompressedJSON)
     upload_date: str
     status: str
+    checks: List["ComplianceCheckRow"] = Relationship(back_populates="regulation")
+
+
+# List endpoint pages (newest first, id breaking ties) are read in index order
+Index("ix_regulation_upload", Regulation.upload_date, Regulation.id)
 
 
 class ComplianceCheckRow(SQLModel, table=True):
     id: str = Field(primary_key=True, index=True)
-    regulation_id: str = Field(index=True)
-    result: Dict[str, Any] = Field(sa_type=JSON)
+    regulation_id: str = Field(index=True, foreign_key="regulation.id")
+    result: Dict[str, Any] = Field(sa_type=CompressedJSON)
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+    regulation: Optional[Regulation] = Relationship(back_populates="checks")
+
+
+# Checks for a regulation in creation order, and their max(created_at), come straight from the index
+Index("ix_cc_reg_created", ComplianceCheckRow.regulation_id, ComplianceCheckRow.created_at)
+# List endpoint pages, as for regulations
+Index("ix_cc_created", ComplianceCheckRow.created_at, ComplianceCheckRow.id)
 
 
 class ReportRow(SQLModel, table=True):
@@ -35,6 +96,26 @@ class ReportRow(SQLModel, table=True):
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 
 
+# Latest report per regulation is read as an index range scan
+Index("ix_report_reg_created", ReportRow.regulation_id, ReportRow.created_at.desc())
+# List endpoint pages, as for regulations
+Index("ix_report_created", ReportRow.created_at, ReportRow.id)
+
+
+# Regulation analyses keyed by sha256 of (text, type, jurisdiction); repeat documents skip the model call
+class AnalysisCache(SQLModel, table=True):
+    hash: str = Field(primary_key=True)
+    analysis: Dict[str, Any] = Field(sa_type=CompressedJSON)
+    created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+
+
+# Latest compliance check per sha256 of (regulation_id, sorted policies)
+class ComplianceCache(SQLModel, table=True):
+    key: str = Field(primary_key=True)
+    check_id: str
+    created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+
+
 # Monitoring tables
 class Source(SQLModel, table=True):
     id: str = Field(primary_key=True, index=True)
@@ -52,7 +133,16 @@ class SourceVersion(SQLModel, table=True):
     source_id: str = Field(index=True)
     fetched_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
     hash: str
+    # None for rows written before this column existed (those are sha256)
+    hash_algo: str | None = None
     title: str | None = None
     snippet: str | None = None
+    # Validators from the response, sent back on the next poll as a conditional request
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+# Latest version of a source is the first entry of an index range scan
+Index("ix_sv_source_fetched", SourceVersion.source_id, SourceVersion.fetched_at.desc())
 
 
@@ -1,10 +1,16 @@
 import os
 import io
+import gzip
+import json
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from urllib.parse import urlencode
 import requests
+from requests.adapters import HTTPAdapter, Retry
+from requests_toolbelt import MultipartEncoder
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+import streamlit.components.v1 as components
 
 API_BASE = os.getenv("API_BASE", "http://localhost:8000")
 
@@ -22,8 +28,201 @@ st.caption("LangChain + Gemini • FastAPI • Streamlit")
 with st.sidebar:
     st.header("Settings")
     api_base = st.text_input("API Base URL", API_BASE)
+    embed_pdf = st.checkbox(
+        "Embed PDF previews in the page",
+        False,
+        help="Use when the browser cannot reach the API URL above directly.",
+    )
     st.write("Use the tabs to upload documents, check compliance, and generate reports.")
 
+
+# -----------------------------
+# HTTP session
+# -----------------------------
+# One pooled Session survives reruns, so clicks reuse kept-alive connections instead of a
+# fresh TCP + TLS handshake each. Connect errors and gateway 5xx responses (a backend that is
+# still cold starting) are retried with backoff; read timeouts are not, since a slow request
+# would otherwise be resent several times.
+@st.cache_resource
+def get_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=False,
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# -----------------------------
+# Cached API reads
+# -----------------------------
+# url -> (ETag, body) of the last full listing, shared by every session. Once the TTL below
+# expires (or on a forced refresh) the listing is revalidated with If-None-Match, and an
+# unchanged one comes back as a bodyless 304.
+@st.cache_resource
+def get_validators() -> dict:
+    return {}
+
+
+def get_json_conditional(url: str, timeout: int = 180) -> dict:
+    validators = get_validators()
+    cached = validators.get(url)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    r = get_session().get(url, headers=headers, timeout=timeout)
+    if r.status_code == 304 and cached:
+        return cached[1]
+    r.raise_for_status()
+    body = r.json()
+    if r.headers.get("ETag"):
+        validators[url] = (r.headers["ETag"], body)
+    return body
+
+
+# The server's largest page size: the fewest round trips for a full listing
+LIST_PAGE_SIZE = 500
+
+
+def get_all_items(get_json, url: str) -> list:
+    """Every item of a paginated list endpoint, following next_cursor from page to page."""
+    items, cursor = [], None
+    while True:
+        params = {"limit": LIST_PAGE_SIZE, **({"cursor": cursor} if cursor else {})}
+        data = get_json(f"{url}?{urlencode(params)}").get("data", {})
+        items.extend(data.get("items", []))
+        cursor = data.get("next_cursor")
+        if not cursor:
+            return items
+
+
+# Reruns within the TTL reuse the last listing instead of another round trip; failed requests
+# raise, and exceptions are never cached, so the next click retries
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_regulations(api_base: str) -> list:
+    return get_all_items(get_json_conditional, f"{api_base}/regulations")
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_sources(api_base: str) -> dict:
+    return get_json_conditional(f"{api_base}/monitor/sources")
+
+
+# Same regulation + options return the PDF bytes from the last build; cleared whenever a new
+# compliance check is run, since that changes the report's content
+@st.cache_data(ttl=600, show_spinner=False, max_entries=32)
+def gen_report(api_base: str, reg_id: str, include_recs: bool) -> tuple:
+    """Return (pdf_bytes, report_id); the id addresses the stored file on /download_report."""
+    payload = {"regulation_id": reg_id, "include_recommendations": include_recs}
+    r = get_session().post(f"{api_base}/generate_professional_report", json=payload, timeout=600)
+    r.raise_for_status()
+    return r.content, r.headers.get("X-Report-Id")
+
+
+# Above this many lines the pyarrow string kernels beat a Python split/strip loop
+ARROW_SPLIT_MIN_LINES = 5000
+
+
+def split_policies(text: str) -> list:
+    """One policy per non-blank line, with surrounding whitespace trimmed."""
+    if text.count("\n") < ARROW_SPLIT_MIN_LINES:
+        return [p.strip() for p in text.split("\n") if p.strip()]
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    lines = pc.split_pattern(pa.array([text]), "\n").values
+    trimmed = pc.utf8_trim_whitespace(lines)
+    return pc.filter(trimmed, pc.greater(pc.utf8_length(trimmed), 0)).to_pylist()
+
+
+# Gap records carry a per-gap status when the model provides one, otherwise an impact level
+GAP_DISTRIBUTION_COLUMNS = ("status", "impact_level")
+# Fixed bar color per category, so a status keeps its color whatever order value_counts returns
+STATUS_COLORS = {
+    "compliant": "#4CAF50",
+    "partially_compliant": "#FFC107",
+    "non_compliant": "#F44336",
+    "low": "#4CAF50",
+    "medium": "#FFC107",
+    "high": "#F44336",
+}
+DEFAULT_STATUS_COLOR = "#999999"
+# Declared column types for the gaps table, so the grid does not infer them from the data
+GAP_COLUMN_CONFIG = {
+    "gap_id": st.column_config.TextColumn("Gap"),
+    "requirement": st.column_config.TextColumn("Requirement"),
+    "current_state": st.column_config.TextColumn("Current state"),
+    "gap_description": st.column_config.TextColumn("Description", width="large"),
+    "impact_level": st.column_config.TextColumn("Impact"),
+    "remediation_effort": st.column_config.TextColumn("Effort"),
+    "recommended_actions": st.column_config.ListColumn("Recommended actions", width="large"),
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_gap_artifacts(gaps_json: str) -> tuple:
+    """Gaps DataFrame and its distribution chart data, keyed on the gaps' JSON so reruns reuse them."""
+    # pandas is only needed to tabulate gaps; importing it lazily keeps it off cold starts
+    import pandas as pd
+
+    # Arrow-backed columns hand straight to st.dataframe's Arrow serializer;
+    # mixed-type columns stay object
+    df = pd.DataFrame(json.loads(gaps_json)).convert_dtypes(dtype_backend="pyarrow")
+    column = next((c for c in GAP_DISTRIBUTION_COLUMNS if c in df.columns), None)
+    if column is None:
+        return df, None
+    counts = df[column].value_counts().rename_axis(column).reset_index(name="count")
+    counts["color"] = [STATUS_COLORS.get(str(v).lower(), DEFAULT_STATUS_COLOR) for v in counts[column]]
+    return df, counts
+
+
+def fan_out(session: requests.Session, urls: list) -> list:
+    """Read independent list endpoints concurrently: wall time is the slowest one, not the sum.
+
+    Each entry is that endpoint's items, or the request exception it raised.
+    """
+    def get_json(url: str) -> dict:
+        r = session.get(url, timeout=180)
+        r.raise_for_status()
+        return r.json()
+
+    def read(url: str):
+        try:
+            return get_all_items(get_json, url)
+        except requests.exceptions.RequestException as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(urls)) as ex:
+        return list(ex.map(read, urls))
+
+
+# -----------------------------
+# Dashboard
+# -----------------------------
+with st.expander("Dashboard"):
+    if st.button("Load Dashboard", key="dash_load"):
+        panels = (("Regulations", "/regulations"), ("Sources", "/monitor/sources"), ("Reports", "/reports"))
+        with st.spinner("Contacting API..."):
+            results = fan_out(get_session(), [f"{api_base}{path}" for _, path in panels])
+        for col, (title, _), res in zip(st.columns(len(panels)), panels, results):
+            with col:
+                st.markdown(f"**{title}**")
+                if isinstance(res, requests.exceptions.ReadTimeout):
+                    st.error("Timed out waiting for the API. The service may be cold starting; please retry.")
+                elif isinstance(res, requests.exceptions.HTTPError):
+                    st.error(res.response.text)
+                elif isinstance(res, Exception):
+                    st.error(str(res))
+                else:
+                    st.metric("Count", len(res))
+                    st.json(res, expanded=False)
+
 # -----------------------------
 # Tabs
 # -----------------------------
@@ -47,12 +246,21 @@ with tab1:
         if not uploaded:
             st.warning("Please upload a file.")
         else:
-            files = {"file": (uploaded.name, uploaded.getvalue(), uploaded.type)}
             data = {"regulation_type": reg_type, "jurisdiction": jurisdiction, "effective_date": effective_date}
+            # Stream the multipart body from the uploaded buffer in small chunks rather than
+            # copying the whole file into a request body first
+            uploaded.seek(0)
+            encoder = MultipartEncoder(fields={**data, "file": (uploaded.name, uploaded, uploaded.type)})
             with st.spinner("Uploading and processing..."):
-                r = requests.post(f"{api_base}/upload_regulation", files=files, data=data, timeout=600)
+                r = get_session().post(
+                    f"{api_base}/upload_regulation",
+                    data=encoder,
+                    headers={"Content-Type": encoder.content_type},
+                    timeout=600,
+                )
             if r.ok:
                 res = r.json()
+                fetch_regulations.clear()
                 st.success("Uploaded. Background processing started.")
                 st.json(res)
             else:
@@ -60,17 +268,17 @@ with tab1:
 
     st.divider()
     st.subheader("Existing Regulations")
+    force_regs = st.checkbox("Force refresh", key="regs_force")
     if st.button("Refresh Regulations"):
+        if force_regs:
+            fetch_regulations.clear()
         try:
             with st.spinner("Contacting API (may take up to 2 minutes on cold start)..."):
-                r = requests.get(f"{api_base}/regulations", timeout=180)
-            if r.ok:
-                data = r.json().get("data", {})
-                items = data.get("items", [])
-                st.write(f"Found {len(items)} item(s)")
-                st.json(items)
-            else:
-                st.error(r.text)
+                items = fetch_regulations(api_base)
+            st.write(f"Found {len(items)} item(s)")
+            st.json(items)
+        except requests.exceptions.HTTPError as e:
+            st.error(e.response.text)
         except requests.exceptions.ReadTimeout:
             st.error("Timed out waiting for the API. If this is the first request after a while, the service may be cold starting. Please try again in a few seconds.")
 
@@ -82,54 +290,79 @@ with tab2:
     reg_id = st.text_input("Regulation ID")
     st.caption("Provide key company policies below (one per line or paragraph).")
     policies_text = st.text_area("Company Policies", height=200)
+    # Chunks are checked independently, so the default keeps a typical paste in one holistic check
+    chunk_size = st.slider(
+        "Policies per check", min_value=1, max_value=200, value=50,
+        help="Longer policy lists are split into chunks that the server checks in parallel. "
+             "Each chunk is assessed on its own, so a requirement covered only in another chunk shows as a gap.",
+    )
+    # Set before running the check: results only render on the button's rerun
+    show_chart = st.toggle("Show distribution chart", value=False)
 
     if st.button("Check Compliance", type="primary"):
         if not reg_id:
             st.warning("Enter a regulation ID")
         else:
+            policies = split_policies(policies_text)
             payload = {
                 "regulation_id": reg_id,
-                "company_policies": [p.strip() for p in policies_text.split("\n") if p.strip()]
+                "policy_batches": [policies[i:i + chunk_size] for i in range(0, len(policies), chunk_size)],
             }
             with st.spinner("Assessing compliance..."):
-                r = requests.post(f"{api_base}/check_compliance", json=payload, timeout=600)
+                # Policy text compresses several-fold; the backend inflates Content-Encoding: gzip bodies
+                body = gzip.compress(json.dumps(payload).encode("utf-8"), compresslevel=6)
+                r = get_session().post(
+                    f"{api_base}/check_compliance_batch",
+                    data=body,
+                    headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+                    timeout=600,
+                )
             if r.ok:
-                res = r.json().get("data", {})
+                checks = r.json().get("data", {}).get("checks", [])
+                gen_report.clear()
                 st.success("Compliance check complete")
 
                 # -----------------------------
                 # Display Summary
                 # -----------------------------
-                st.metric("Compliance Score", res.get("compliance_score", 0))
-                st.write("Overall Status:", res.get("overall_status"))
+                scores = [c.get("compliance_score", 0) for c in checks]
+                st.metric("Compliance Score", round(sum(scores) / len(scores), 1) if scores else 0)
+                statuses = [c.get("overall_status") for c in checks]
+                st.write("Overall Status:", statuses[0] if len(set(statuses)) == 1 else ", ".join(map(str, statuses)))
 
                 # -----------------------------
                 # Compliance Table
                 # -----------------------------
-                gaps = res.get("gaps", [])
+                # The same requirement gap comes back once per chunk; keep its first occurrence
+                unique_gaps = {}
+                for g in chain.from_iterable(c.get("gaps", []) for c in checks):
+                    unique_gaps.setdefault((g.get("requirement"), g.get("gap_description")), g)
+                gaps = list(unique_gaps.values())
                 if gaps:
-                    df_gaps = pd.DataFrame(gaps)
+                    df_gaps, counts = build_gap_artifacts(json.dumps(gaps, sort_keys=True))
                     st.subheader("Compliance Details")
-                    st.dataframe(df_gaps)
-
-                    # Pie chart
-                    st.subheader("Compliance Distribution")
-                    counts = df_gaps['status'].value_counts()
-                    fig, ax = plt.subplots()
-                    ax.pie(
-                        counts,
-                        labels=counts.index,
-                        autopct="%1.1f%%",
-                        startangle=90,
-                        colors=['#4CAF50', '#FFC107', '#F44336']
+                    # Read-only grid: fixed rows, no index, declared column types
+                    st.data_editor(
+                        df_gaps,
+                        disabled=True,
+                        num_rows="fixed",
+                        hide_index=True,
+                        column_config=GAP_COLUMN_CONFIG,
+                        key="gaps_table",
                     )
-                    ax.axis('equal')
-                    st.pyplot(fig)
+
+                    if show_chart and counts is not None:
+                        st.subheader("Compliance Distribution")
+                        # Vega-Lite chart drawn in the browser; no server-side figure rendering
+                        st.bar_chart(counts, x=counts.columns[0], y="count", color="color")
                 else:
                     st.info("No gaps detected. Fully compliant!")
 
                 # Recommendations
-                recs = res.get("recommendations", [])
+                # Keyed on the JSON encoding: the model may return dict recommendations, which are unhashable
+                recs = list({
+                    json.dumps(r, sort_keys=True): r for r in chain.from_iterable(c.get("recommendations", []) for c in checks)
+                }.values())
                 if recs:
                     st.subheader("Recommendations")
                     for i, r in enumerate(recs, 1):
@@ -149,12 +382,12 @@ with tab3:
         if not reg_id_r:
             st.warning("Enter a regulation ID")
         else:
-            payload = {"regulation_id": reg_id_r, "include_recommendations": include_recs}
-            with st.spinner("Generating professional PDF..."):
-                resp = requests.post(f"{api_base}/generate_professional_report", json=payload, timeout=600)
-
-            if resp.ok:
-                pdf_bytes = resp.content
+            try:
+                with st.spinner("Generating professional PDF..."):
+                    pdf_bytes, report_id = gen_report(api_base, reg_id_r, include_recs)
+            except requests.exceptions.HTTPError as e:
+                st.error(e.response.text)
+            else:
                 if not pdf_bytes:
                     st.error("Empty PDF returned from backend")
                 else:
@@ -165,15 +398,35 @@ with tab3:
                         file_name=f"compliance_report_{reg_id_r}.pdf",
                         mime="application/pdf",
                     )
-                    # Inline preview
-                    b64 = base64.b64encode(pdf_bytes).decode()
-                    st.markdown(
-                        f"<iframe src='data:application/pdf;base64,{b64}' width='100%' height='800px'></iframe>",
-                        unsafe_allow_html=True,
-                    )
+                    # Inline preview: the browser loads the stored report itself, once and
+                    # cacheably, instead of parsing a base64 copy on every rerun
+                    if report_id and not embed_pdf:
+                        components.html(
+                            f'<iframe src="{api_base}/download_report/{report_id}?inline=true" '
+                            f'width="100%" height="800px"></iframe>',
+                            height=820,
+                        )
+                    else:
+                        # Fallback when the API is not reachable from the browser: decode the
+                        # base64 once into a Blob and point the iframe at its object URL. The
+                        # encoding is kept in session state so re-previewing the same report
+                        # does not base64 the whole PDF again
+                        pdf_sig = (reg_id_r, include_recs, report_id, len(pdf_bytes))
+                        if st.session_state.get("pdf_sig") != pdf_sig:
+                            st.session_state["pdf_b64"] = base64.b64encode(pdf_bytes).decode()
+                            st.session_state["pdf_sig"] = pdf_sig
+                        b64 = st.session_state["pdf_b64"]
+                        components.html(
+                            f"""<iframe id="pdf" width="100%" height="800px"></iframe>
+<script>
+const raw = atob("{b64}");
+const bytes = new Uint8Array(raw.length);
+for (let i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+document.getElementById("pdf").src = URL.createObjectURL(new Blob([bytes], {{type: "application/pdf"}}));
+</script>""",
+                            height=820,
+                        )
                     st.success("PDF ready!")
-            else:
-                st.error(resp.text)
 
 # -----------------------------
 # Tab 4: Monitoring
@@ -197,30 +450,32 @@ with tab4:
             }
             if m_due > 0:
                 params["due_days"] = m_due
-            r = requests.post(f"{api_base}/monitor/sources", params=params, timeout=60)
+            r = get_session().post(f"{api_base}/monitor/sources", params=params, timeout=60)
             if r.ok:
+                fetch_sources.clear()
                 st.success("Source added")
             else:
                 st.error(r.text)
 
     col_a, col_b = st.columns(2)
     with col_a:
+        force_srcs = st.checkbox("Force refresh", key="m_force")
         if st.button("Refresh Sources", key="m_list"):
+            if force_srcs:
+                fetch_sources.clear()
             try:
-                r = requests.get(f"{api_base}/monitor/sources", timeout=180)
-                if r.ok:
-                    data = r.json().get("data", {})
-                    items = data.get("items", [])
-                    st.write(f"{len(items)} source(s)")
-                    st.json(items)
-                else:
-                    st.error(r.text)
+                data = fetch_sources(api_base).get("data", {})
+                items = data.get("items", [])
+                st.write(f"{len(items)} source(s)")
+                st.json(items)
+            except requests.exceptions.HTTPError as e:
+                st.error(e.response.text)
             except requests.exceptions.ReadTimeout:
                 st.error("Timed out waiting for sources. Please retry; the API may be cold starting.")
     with col_b:
         if st.button("Run Monitor Now", key="m_run"):
             try:
-                r = requests.post(f"{api_base}/monitor/run", timeout=300)
+                r = get_session().post(f"{api_base}/monitor/run", timeout=300)
                 if r.ok:
                     st.success(r.json())
                 else: